@@ -1,89 +1,58 @@
-import io
-import unicodedata
+import hashlib
+import os
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import streamlit as st
 import requests
-from auth import require_authentication, AuthManager, init_session_state
+from auth import require_authentication, get_auth_manager, init_session_state, logout
+from carga import baixar_xlsx, gravar_parquet, ler_abas_xlsx, ler_parquet, limpar_abas, pasta_parquet
+from planilha import find_col, mapear_colunas, to_number_series
 from datetime import datetime
+from pathlib import Path
 import plotly.express as px
-import plotly.graph_objects as go
 
 
 st.set_page_config(page_title="BI - Entregas (GPCA)", page_icon="📦", layout="wide")
 
 init_session_state()
-auth_manager = AuthManager(credentials_file="credentials.json")
+auth_manager = get_auth_manager("credentials.json")
 
 if not require_authentication(auth_manager, logo_path="logo.svg"):
     st.stop()
 
 
-def atualizar_cache_e_rerun():
-    try:
-        carregar_planilha_xlsx.clear()
-    except Exception:
-        st.cache_data.clear()
-
-    st.session_state["reset_key"] = datetime.now().timestamp()
-    st.rerun()
-
-
-with st.container():
-    col1, col2 = st.columns([4, 1.1])
-
-    with col1:
-        st.markdown(
-            """
-            <div style="display:flex;align-items:center;gap:10px;">
-                <span style="font-size:26px;">👤</span>
-                <h2 style="margin:0;color:#0C2856;">
-                    SES-PE <span style="font-weight:400;">(sespe)</span>
-                </h2>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+# Usuário e ações ficam no topo da barra lateral, fora do corpo da página
+with st.sidebar:
+    st.markdown(
+        """
+        <div style="display:flex;align-items:center;gap:8px;">
+            <span style="font-size:22px;">👤</span>
+            <h3 style="margin:0;color:#0C2856;">
+                SES-PE <span style="font-weight:400;">(sespe)</span>
+            </h3>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
 
-    with col2:
-        st.markdown(
-            """
-            <style>
-            .top-actions button {
-                width: 120px !important;
-                height: 36px !important;
-                background-color:#0C2856 !important;
-                color:white !important;
-                border:none !important;
-                border-radius:8px !important;
-                font-size:15px !important;
-                margin-left:8px !important;
-            }
-            </style>
-            """,
-            unsafe_allow_html=True
-        )
+    # Tratado mais abaixo, depois que os loaders em cache já foram definidos
+    atualizar = st.button("Atualizar", key="refresh_btn", use_container_width=True)
+    st.button("Logout", key="logout_btn", on_click=logout, use_container_width=True)
 
-        bcol1, bcol2 = st.columns([1, 1])
-        with bcol1:
-            st.markdown('<div class="top-actions">', unsafe_allow_html=True)
-            if st.button("Atualizar", key="refresh_btn"):
-                atualizar_cache_e_rerun()
-            st.markdown('</div>', unsafe_allow_html=True)
+    st.divider()
 
-        with bcol2:
-            st.markdown('<div class="top-actions">', unsafe_allow_html=True)
-            if st.button("Logout", key="logout_btn"):
-                for key in list(st.session_state.keys()):
-                    st.session_state.pop(key, None)
-                st.session_state["authenticated"] = False
-                st.rerun()
-            st.markdown('</div>', unsafe_allow_html=True)
+# mtime_ns entra na chave (como em auth.py): editar o style.css vale sem reiniciar o app
+@st.cache_data(show_spinner=False)
+def ler_css(caminho: str, mtime_ns: int) -> str:
+    with open(caminho, "r", encoding="utf-8") as f:
+        return f.read()
 
-st.divider()
 
 try:
-    with open("style.css", "r", encoding="utf-8") as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    css = ler_css("style.css", os.stat("style.css").st_mtime_ns)
+    st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 except FileNotFoundError:
     pass
 
@@ -91,6 +60,7 @@ except FileNotFoundError:
 SHEET_ID = "1asY-XmwXtHa7Nb-hYpxSpjz1PeSU96I5"
 XLSX_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/export?format=xlsx"
 HEADER_ROW_INDEX = 2
+CACHE_DIR = Path.home() / ".cache" / "bi-mobiliario"
 
 CONFIG_MODEBAR = {
     "displaylogo": False,
@@ -103,32 +73,52 @@ CONFIG_MODEBAR = {
     "modeBarButtonsToAdd": ["toImage"]
 }
 
-def norm(s: str) -> str:
-    s = str(s or "").strip().lower()
-    return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("utf-8")
+# Gráfico: rótulos nas barras só até LIMITE_ROTULOS destinos; acima de LIMITE_DESTINOS
+# mostra apenas os TOPO_DESTINOS maiores em valor
+LIMITE_ROTULOS = 40
+LIMITE_DESTINOS = 200
+TOPO_DESTINOS = 50
 
+# Colunas do gráfico convertidas para número uma vez, ao montar a base
+COLUNAS_NUMERICAS = ["VALOR TOTAL", "QUANTIDADE ENTREGUE NA UNIDADE"]
 
-@st.cache_data(ttl=600, show_spinner=True)
-def carregar_planilha_xlsx(url: str, header_row_index: int) -> dict:
-    resp = requests.get(url)
-    resp.raise_for_status()
-    with io.BytesIO(resp.content) as f:
-        sheets = pd.read_excel(
-            f,
-            sheet_name=None,
-            dtype=str,
-            header=header_row_index
-        )
+# <<< NÃO alterei os filtros >>>
+CAMPOS = [
+    "DESCRIÇÃO DO ITEM RESUMIDA",
+    "UNIDADES DE DESTINO",
+    "N° OF",
+    "QUANTIDADE ENTREGUE NA UNIDADE",
+    "QUANTIDADE NA ATA E CONSUMO",
+]
 
-    limpos = {}
-    for aba, df in sheets.items():
-        if df is None or df.empty:
-            continue
 
-        df.columns = [str(c).strip() for c in df.columns]
-        df = df.dropna(how="all").dropna(axis=1, how="all")
-        if not df.empty:
-            limpos[aba] = df.reset_index(drop=True)
+@st.cache_resource
+def _sessao_http() -> requests.Session:
+    return requests.Session()
+
+
+@st.cache_data(ttl=600, show_spinner=True)
+def versao_planilha(url: str) -> tuple:
+    """Baixa (ou revalida) o XLSX no máximo a cada 10 min e devolve (caminho, sha256 do conteúdo).
+
+    É o único TTL da carga: montar_base é chaveado pelo sha256, então a base em memória
+    nunca fica mais velha que esta verificação.
+    """
+    arq_xlsx, sha256 = baixar_xlsx(_sessao_http(), url, CACHE_DIR, SHEET_ID)
+    return str(arq_xlsx), sha256
+
+
+def carregar_planilha_xlsx(arq_xlsx: str, sha256: str, header_row_index: int) -> dict:
+    # Planilha inalterada desde a última leitura: lê o Parquet em vez de reprocessar o XLSX
+    pasta = pasta_parquet(CACHE_DIR / f"{SHEET_ID}-parquet", sha256, header_row_index)
+    limpos = ler_parquet(pasta)
+    if limpos is not None:
+        return limpos
+
+    # O parser lê direto do arquivo, sem manter uma cópia do XLSX em memória
+    limpos = limpar_abas(ler_abas_xlsx(arq_xlsx, header_row_index))
+    if limpos:
+        gravar_parquet(pasta, limpos)
     return limpos
 
 
@@ -139,26 +129,75 @@ def selectbox_com_todos(label, serie: pd.Series):
     return None if esco == "(Todos)" else esco
 
 
+@st.cache_resource(max_entries=2, show_spinner=True)
+def montar_base(arq_xlsx: str, sha256: str, header_row_index: int) -> dict:
+    """Monta df_full uma vez por versão da planilha e o reaproveita entre reruns e sessões.
+
+    O cache_resource devolve sempre o mesmo objeto (sem cópia), então o resto do
+    script só lê df_full: filtros usam máscaras e nunca o alteram. Sem TTL próprio:
+    um sha256 novo vindo de versao_planilha já monta outra base.
+    """
+    todas_abas = carregar_planilha_xlsx(arq_xlsx, sha256, header_row_index)
+    if not todas_abas:
+        return {"abas": [], "df_full": None, "num": None, "opcoes": {}, "versao": sha256}
+
+    # Padroniza os nomes de cada aba (ALVO_NOMES) antes de concatenar;
+    # o pandas preserva a ordem da primeira aba e adiciona novas ao final.
+    dfs = [
+        df.rename(columns={col_real: alvo for alvo, col_real in mapear_colunas(df).items() if col_real != alvo})
+        for df in todas_abas.values()
+    ]
+    df_full = pd.concat(dfs, ignore_index=True, sort=False)
+
+    # Colunas que faltam em alguma aba podem sair do concat como object; volta tudo para Arrow
+    objetos = df_full.select_dtypes(include="object").columns
+    if len(objetos):
+        df_full[objetos] = df_full[objetos].astype("string[pyarrow]")
+
+    # ABA já nasce como category a partir dos tamanhos de cada aba (sem gravar o nome em cada
+    # linha nem tocar nas abas); as categorias seguem a ordem das abas na planilha
+    codigos = np.repeat(np.arange(len(dfs), dtype=np.int32), [len(d) for d in dfs])
+    df_full["ABA"] = pd.Categorical.from_codes(codigos, categories=list(todas_abas.keys()))
+
+    # Valor e quantidade do gráfico já convertidos para float, alinhados linha a linha com df_full
+    num = pd.DataFrame({c: to_number_series(df_full[c]) for c in COLUNAS_NUMERICAS if c in df_full.columns})
+
+    # As colunas de filtro repetem poucos valores: como category, isin/== comparam códigos inteiros
+    for c in CAMPOS:
+        if c in df_full.columns:
+            df_full[c] = df_full[c].astype("category")
+
+    # Opções de cada filtro = categorias (o pandas já as cria ordenadas), montadas junto com a base
+    opcoes = {c: df_full[c].cat.categories.astype(str).tolist() for c in CAMPOS if c in df_full.columns}
+
+    # versao (o sha256 da planilha) entra na chave dos caches derivados da base
+    return {
+        "abas": list(todas_abas.keys()), "df_full": df_full, "num": num,
+        "opcoes": opcoes, "versao": sha256,
+    }
+
+
+if atualizar:
+    # Força só a revalidação do XLSX; se o sha256 mudar, montar_base monta a nova base.
+    # Sessão HTTP, AuthManager e assets do login ficam
+    versao_planilha.clear()
+    st.session_state["reset_key"] = datetime.now().timestamp()
+
 try:
-    todas_abas = carregar_planilha_xlsx(XLSX_URL, HEADER_ROW_INDEX)
+    base = montar_base(*versao_planilha(XLSX_URL), HEADER_ROW_INDEX)
 except Exception as e:
     st.error("❌ Não consegui ler a planilha. Abra o acesso (Qualquer pessoa com o link - Leitor)."
              f"\n\nDetalhes: {e}")
     st.stop()
 
-if not todas_abas:
+if not base["abas"]:
     st.warning("Planilha sem conteúdo legível.")
     st.stop()
 
-# Concatena todas as abas mantendo as colunas como vieram;
-# o pandas preserva a ordem da primeira aba e adiciona novas ao final.
-dfs = []
-for aba, df in todas_abas.items():
-    d2 = df.copy()
-    d2["ABA"] = aba
-    dfs.append(d2)
+abas = base["abas"]
+df_full = base["df_full"]
 
-df_full = pd.concat(dfs, ignore_index=True, sort=False)
+OPCOES = base["opcoes"]
 
 col1, col2 = st.columns([4, 1])
 
@@ -186,7 +225,7 @@ with col2:
 with st.sidebar:
     st.header("Abas")
 
-    opcoes_abas = ["(Todas)"] + list(todas_abas.keys())
+    opcoes_abas = ["(Todas)"] + abas
 
     def _selecionar_todas():
         st.session_state["abas_sel"] = ["(Todas)"]
@@ -207,11 +246,14 @@ with st.sidebar:
 abas_especificas = [a for a in st.session_state.get("abas_sel", []) if a != "(Todas)"]
 
 if "(Todas)" in st.session_state.get("abas_sel", []) or len(abas_especificas) == 0:
-    abas_escolhidas = list(todas_abas.keys())
+    abas_escolhidas = list(abas)
 else:
     abas_escolhidas = abas_especificas
 
-df_work = df_full[df_full["ABA"].isin(abas_escolhidas)].copy()
+# Sem cópia: os filtros só acumulam uma máscara booleana e o recorte é feito uma vez no final
+df_work = df_full
+cat_aba = df_work["ABA"].cat
+mask = np.isin(cat_aba.codes.to_numpy(), cat_aba.categories.get_indexer(abas_escolhidas))
 
 st.sidebar.header("Filtros")
 
@@ -225,100 +267,71 @@ def limpar_filtros():
 if st.sidebar.button("🧹 Limpar filtros"):
     limpar_filtros()
 
-def select_valor_com_todos(rotulo: str, serie: pd.Series, key: str):
-    valores_unicos = sorted(serie.dropna().astype(str).unique().tolist())
+def valores_presentes(coluna: str, mask: np.ndarray) -> list:
+    """Valores ordenados da coluna de filtro que aparecem nas linhas marcadas em mask."""
+    if mask.all():
+        return OPCOES[coluna]
+
+    # Conta os códigos das linhas selecionadas em vez de varrer as strings
+    codes = df_work[coluna].cat.codes.to_numpy()[mask]
+    presentes = np.bincount(codes[codes >= 0], minlength=len(OPCOES[coluna])) > 0
+    return [v for v, p in zip(OPCOES[coluna], presentes) if p]
+
+
+def select_valor_com_todos(rotulo: str, coluna: str, mask: np.ndarray, key: str):
+    valores_unicos = valores_presentes(coluna, mask)
     opcoes = ["(Todos)"] + valores_unicos
     escolha = st.sidebar.selectbox(rotulo, opcoes, key=key)
     return None if escolha == "(Todos)" else escolha
 
-# <<< NÃO alterei os filtros >>>
-CAMPOS = [
-    "DESCRIÇÃO DO ITEM RESUMIDA",
-    "UNIDADES DE DESTINO",
-    "N° OF",
-    "QUANTIDADE ENTREGUE NA UNIDADE",
-    "QUANTIDADE NA ATA E CONSUMO",
-]
-
-opcoes_presentes = [c for c in CAMPOS if c in df_work.columns]
+# Toda coluna de filtro presente tem suas opções em OPCOES (montado na base, na ordem de CAMPOS)
+opcoes_presentes = list(OPCOES)
 
 if not opcoes_presentes:
     st.sidebar.warning("⚠️ Nenhuma das colunas de filtro iniciais existe na planilha.")
-    df_filtrado = df_work.copy()
+    df_filtrado = df_work.loc[mask]
 else:
     reset_key = st.session_state.get("reset_key", 0)
 
-    filtro1 = st.sidebar.selectbox(
-        "1º filtro:",
-        opcoes_presentes,
-        key=f"filtro1_{reset_key}"
-    )
-    valor1 = select_valor_com_todos(
-        f"Escolha {filtro1}:",
-        df_work[filtro1],
-        key=f"valor1_{reset_key}"
-    )
-    df_filtrado = df_work[df_work[filtro1] == valor1] if valor1 is not None else df_work.copy()
-
-    restantes2 = [c for c in opcoes_presentes if c != filtro1]
-    filtro2 = st.sidebar.selectbox(
-        "2º filtro (opcional):",
-        ["(Nenhum)"] + restantes2,
-        key=f"filtro2_{reset_key}"
-    )
-    if filtro2 != "(Nenhum)" and filtro2 in df_filtrado.columns:
-        valor2 = select_valor_com_todos(
-            f"Escolha {filtro2}:",
-            df_filtrado[filtro2],
-            key=f"valor2_{reset_key}"
+    restantes = list(opcoes_presentes)
+    for i in range(1, 6):
+        if i == 1:
+            filtro = st.sidebar.selectbox("1º filtro:", restantes, key=f"filtro1_{reset_key}")
+        else:
+            filtro = st.sidebar.selectbox(
+                f"{i}º filtro (opcional):",
+                ["(Nenhum)"] + restantes,
+                key=f"filtro{i}_{reset_key}"
+            )
+        if filtro in (None, "(Nenhum)"):
+            break
+
+        valor = select_valor_com_todos(
+            f"Escolha {filtro}:",
+            filtro,
+            mask,
+            key=f"valor{i}_{reset_key}"
         )
-        if valor2 is not None:
-            df_filtrado = df_filtrado[df_filtrado[filtro2] == valor2]
-
-    restantes3 = [c for c in opcoes_presentes if c not in [filtro1, filtro2] and c != "(Nenhum)"]
-    filtro3 = st.sidebar.selectbox(
-        "3º filtro (opcional):",
-        ["(Nenhum)"] + restantes3,
-        key=f"filtro3_{reset_key}"
-    )
-    if filtro3 != "(Nenhum)" and filtro3 in df_filtrado.columns:
-        valor3 = select_valor_com_todos(
-            f"Escolha {filtro3}:",
-            df_filtrado[filtro3],
-            key=f"valor3_{reset_key}"
-        )
-        if valor3 is not None:
-            df_filtrado = df_filtrado[df_filtrado[filtro3] == valor3]
-
-    restantes4 = [c for c in opcoes_presentes if c not in [filtro1, filtro2, filtro3] and c != "(Nenhum)"]
-    filtro4 = st.sidebar.selectbox(
-        "4º filtro (opcional):",
-        ["(Nenhum)"] + restantes4,
-        key=f"filtro4_{reset_key}"
-    )
-    if filtro4 != "(Nenhum)" and filtro4 in df_filtrado.columns:
-        valor4 = select_valor_com_todos(
-            f"Escolha {filtro4}:",
-            df_filtrado[filtro4],
-            key=f"valor4_{reset_key}"
-        )
-        if valor4 is not None:
-            df_filtrado = df_filtrado[df_filtrado[filtro4] == valor4]
-
-    restantes5 = [c for c in opcoes_presentes if c not in [filtro1, filtro2, filtro3, filtro4] and c != "(Nenhum)"]
-    filtro5 = st.sidebar.selectbox(
-        "5º filtro (opcional):",
-        ["(Nenhum)"] + restantes5,
-        key=f"filtro5_{reset_key}"
-    )
-    if filtro5 != "(Nenhum)" and filtro5 in df_filtrado.columns:
-        valor5 = select_valor_com_todos(
-            f"Escolha {filtro5}:",
-            df_filtrado[filtro5],
-            key=f"valor5_{reset_key}"
-        )
-        if valor5 is not None:
-            df_filtrado = df_filtrado[df_filtrado[filtro5] == valor5]
+        if valor is not None:
+            # Compara os códigos inteiros da categoria em vez das strings
+            cat = df_work[filtro].cat
+            mask &= (cat.codes.to_numpy() == cat.categories.get_loc(valor))
+
+        restantes.remove(filtro)
+        if not restantes:
+            break
+
+    df_filtrado = df_work.loc[mask]
+
+# Só as primeiras linhas vão para o navegador; a exportação continua com o recorte completo
+linhas_exibidas = st.sidebar.number_input(
+    "Linhas exibidas na tabela",
+    min_value=100,
+    max_value=50000,
+    value=1000,
+    step=500,
+    key="linhas_exibidas"
+)
 
 abas_texto = ", ".join(abas_escolhidas)
 st.subheader("Dados Filtrados")
@@ -327,25 +340,39 @@ if abas_texto:
 
 st.caption(f"{len(df_filtrado)} registros exibidos após os filtros aplicados.")
 
+def gerar_csv_filtrado() -> bytes:
+    # O writer do Arrow grava UTF-8 direto num buffer, sem montar a str inteira do to_csv;
+    # colunas category viram dictionary no Arrow e são decodificadas para texto antes
+    tabela = pa.Table.from_pandas(df_filtrado, preserve_index=False)
+    tabela = tabela.cast(pa.schema([
+        pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f
+        for f in tabela.schema
+    ]))
+    saida = pa.BufferOutputStream()
+    # "needed" é o mínimo do Arrow: aspas em todo campo de texto (que pode conter vírgula/aspas),
+    # números e vazios sem aspas. Não há modo equivalente ao mínimo por valor do to_csv.
+    pacsv.write_csv(tabela, saida, write_options=pacsv.WriteOptions(quoting_style="needed"))
+    return saida.getvalue().to_pybytes()
+
+# O CSV só é gerado quando o usuário clica, não a cada rerun
 st.download_button(
     "⬇️ Exportar Dados",
-    data=df_filtrado.to_csv(index=False).encode("utf-8"),
+    data=gerar_csv_filtrado,
     file_name="emendas_filtrado.csv",
     mime="text/csv",
 )
 
 # >>> Exibe exatamente na ordem das colunas do DataFrame (como vieram da planilha)
-st.dataframe(df_filtrado, use_container_width=True)
+if len(df_filtrado) > linhas_exibidas:
+    st.caption(f"Mostrando as primeiras {linhas_exibidas} linhas; use \"Exportar Dados\" para obter todas.")
+st.dataframe(df_filtrado.head(linhas_exibidas), use_container_width=True)
 
 # --- Gráfico (inalterado) ---
-def find_col(df, targets):
-    cols_norm = {c: norm(c) for c in df.columns}
-    for t in targets:
-        tnorm = norm(t)
-        for c, cn in cols_norm.items():
-            if cn == tnorm or tnorm in cn:
-                return c
-    return None
+@st.cache_data(show_spinner=False, max_entries=64)
+def agregar_grafico(chave: tuple, dest: str, col_valor: str, col_unid: str, _work: pd.DataFrame) -> pd.DataFrame:
+    """Soma valor e quantidade por destino; `chave` (versão da base + máscara) identifica o recorte no cache."""
+    agg = _work.groupby(dest, dropna=False, observed=True, sort=False)[[col_valor, col_unid]].sum().reset_index()
+    return agg.sort_values(col_valor, ascending=False)
 
 dest = find_col(df_filtrado, ["UNIDADES DE DESTINO"])
 if not dest:
@@ -367,42 +394,52 @@ else:
     if faltantes:
         st.warning("Não encontrei as colunas: " + ", ".join(faltantes))
     else:
-        def to_number(v):
-            if pd.isna(v):
-                return 0.0
-            x = str(v).strip().replace("R$", "").replace(" ", "").replace(".", "").replace(",", ".")
-            try:
-                return float(x)
-            except Exception:
-                return 0.0
-
-        work = df_filtrado[[dest, col_valor, col_unid]].copy()
-        for c in [col_valor, col_unid]:
-            work[c] = work[c].map(to_number)
-
-        agg = work.groupby(dest, dropna=False)[[col_valor, col_unid]].sum().reset_index()
-        agg = agg.sort_values(col_valor, ascending=False)
-
-        fig = go.Figure()
-
-        fig.add_trace(go.Bar(
-            x=agg[dest], y=agg[col_valor],
-            name="VALOR TOTAL",
-            text=[f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") for v in agg[col_valor]],
-            textposition="outside",
-            marker_color="#2E86DE"
-        ))
-
-        fig.add_trace(go.Bar(
-            x=agg[dest], y=agg[col_unid],
-            name="QUANTIDADE ENTREGUE NA UNIDADE",
-            text=agg[col_unid],
-            textposition="outside",
-            marker_color="#E74C3C"
-        ))
+        # Valor e quantidade vêm já convertidos da base; só colunas achadas por apelido
+        # alternativo (fora de COLUNAS_NUMERICAS) ainda são convertidas aqui
+        num = base["num"]
+        work = df_filtrado[[dest]].assign(**{
+            c: num[c].to_numpy()[mask] if c in num.columns else to_number_series(df_filtrado[c])
+            for c in [col_valor, col_unid]
+        })
+        # O recorte é definido pela versão da base e pela máscara: resumir os bits da máscara
+        # sai bem mais barato que hashear o conteúdo das colunas a cada rerun
+        chave = (base["versao"], hashlib.blake2b(np.packbits(mask).tobytes(), digest_size=16).hexdigest())
+        agg = agregar_grafico(chave, dest, col_valor, col_unid, work)
+
+        # Muitos destinos: só os maiores vão para o navegador, e sem rótulos fixos nas barras
+        total_destinos = len(agg)
+        if total_destinos > LIMITE_DESTINOS:
+            agg = agg.head(TOPO_DESTINOS)
+
+        # Formato longo (uma linha por destino x métrica) num único px.bar; os rótulos
+        # são formatados pelo próprio Plotly.js (d3-format) em vez de strings montadas em Python
+        agg_long = agg.rename(columns={
+            col_valor: "VALOR TOTAL",
+            col_unid: "QUANTIDADE ENTREGUE NA UNIDADE",
+        }).melt(id_vars=[dest], var_name="Métrica", value_name="Valor")
+
+        fig = px.bar(
+            agg_long, x=dest, y="Valor", color="Métrica", barmode="group",
+            category_orders={
+                dest: agg[dest].tolist(),
+                "Métrica": ["VALOR TOTAL", "QUANTIDADE ENTREGUE NA UNIDADE"],
+            },
+            color_discrete_map={
+                "VALOR TOTAL": "#2E86DE",
+                "QUANTIDADE ENTREGUE NA UNIDADE": "#E74C3C",
+            },
+        )
+        if len(agg) <= LIMITE_ROTULOS:
+            fig.update_traces(textposition="outside")
+            fig.update_traces(texttemplate="R$ %{y:,.2f}", selector=dict(name="VALOR TOTAL"))
+            fig.update_traces(texttemplate="%{y:,.2~f}", selector=dict(name="QUANTIDADE ENTREGUE NA UNIDADE"))
+
+        titulo = f"Entregas por {dest} — VALOR e QUANTIDADES"
+        if total_destinos > len(agg):
+            titulo += f" (Top {len(agg)} de {total_destinos})"
 
         fig.update_layout(
-            title=f"Entregas por {dest} — VALOR e QUANTIDADES",
+            title=titulo,
             barmode="group",
             xaxis_title=dest,
             yaxis_title="Valores / Quantidades",
@@ -410,7 +447,9 @@ else:
             margin=dict(l=10, r=10, t=60, b=10),
             height=560,
             uniformtext_minsize=8,
-            uniformtext_mode='hide'
+            uniformtext_mode='hide',
+            separators=",.",
+            uirevision="static"
         )
 
         st.plotly_chart(fig, use_container_width=True, config=CONFIG_MODEBAR)
@@ -2,9 +2,23 @@ import bcrypt
 import streamlit as st
 from typing import Optional, Dict
 import json
+import os
 from pathlib import Path
 import base64
 
+# Texto fixo do expander "Precisa de ajuda?" do login
+_HELP_MD = """
+*Primeiro acesso:*  
+Entre em contato com o administrador do sistema.
+
+*Esqueceu a senha:*  
+Contate o suporte técnico da Secretaria.
+
+*Suporte:*  
+📧 suporte@saude.pe.gov.br  
+📞 (81) 3181-XXXX
+"""
+
 class AuthManager:
     """Gerenciador de autenticação com bcrypt"""
 
@@ -89,27 +103,101 @@ class AuthManager:
         user_info.pop("password", None)
         return user_info
 
+@st.cache_resource(show_spinner=False)
+def _auth_manager_cache(credentials_file: str, mtime: float) -> AuthManager:
+    return AuthManager(credentials_file)
+
+def get_auth_manager(credentials_file: str = "credentials.json") -> AuthManager:
+    """AuthManager único por processo: credenciais lidas uma vez, não a cada rerun.
+
+    O mtime do JSON entra na chave, então editar o arquivo recarrega as credenciais.
+    """
+    try:
+        mtime = os.stat(credentials_file).st_mtime
+    except OSError:
+        mtime = 0.0
+    return _auth_manager_cache(credentials_file, mtime)
+
+# Usado quando o logo não existe ou não pode ser lido
+_LOGO_PADRAO = "<h2 style='text-align:center;'>Secretaria da Saúde - PE</h2>"
+
+# Teto para os arquivos de texto do login (o logo.svg atual tem ~640 KB)
+_MAX_TEXTO = 2 * 1024 * 1024
+
+def _read_file_text(path: str) -> Optional[str]:
+    """Conteúdo de um arquivo de texto (CSS/SVG do login), ou None se não existir/passar do teto"""
+    try:
+        with open(path, "rb", buffering=0) as f:
+            data = f.read(_MAX_TEXTO + 1)
+    except OSError:
+        return None
+    if len(data) > _MAX_TEXTO:
+        return None
+    return data.decode("utf-8")
+
+# O HTML pronto do logo e o bloco <style> ficam em cache_resource (a própria string, sem a
+# cópia que o cache_data desserializaria a cada rerun); o mtime na chave pega edições do arquivo
+@st.cache_resource(show_spinner=False)
+def _cached_logo_html(logo_path: str, mtime: float) -> str:
+    if os.path.splitext(logo_path)[1].lower() == ".svg":
+        svg_content = _read_file_text(logo_path)
+        if svg_content is None:
+            return _LOGO_PADRAO
+        return f'<div class="logo-section">{svg_content}</div>'
+    logo_b64 = get_image_base64(Path(logo_path))
+    return f"""
+            <div class="logo-section">
+                <img src="data:image/png;base64,{logo_b64}" alt="Logo" />
+            </div>
+            """
+
+@st.cache_resource(show_spinner=False)
+def _cached_css(css_path: str, mtime: float) -> Optional[str]:
+    css_content = _read_file_text(css_path)
+    return None if css_content is None else f"<style>{css_content}</style>"
+
+def _build_logo_html(logo_path: str) -> str:
+    """HTML do logo (SVG inline ou imagem em base64), montado uma vez por versão do arquivo"""
+    try:
+        mtime = os.stat(logo_path).st_mtime
+    except OSError:
+        return _LOGO_PADRAO
+    return _cached_logo_html(str(logo_path), mtime)
+
+def _get_css(css_path: str) -> Optional[str]:
+    """Bloco <style> com o CSS do login, ou None se o arquivo não existir"""
+    try:
+        mtime = os.stat(css_path).st_mtime
+    except OSError:
+        return None
+    return _cached_css(str(css_path), mtime)
+
 def init_session_state():
     """Inicializa variáveis de sessão"""
-    if "authenticated" not in st.session_state:
-        st.session_state.authenticated = False
-    if "username" not in st.session_state:
-        st.session_state.username = None
-    if "user_info" not in st.session_state:
-        st.session_state.user_info = None
+    ss = st.session_state
+    if "authenticated" not in ss:
+        ss.update(authenticated=False, username=None, user_info=None)
 
 def logout():
-    """Realiza logout do usuário"""
-    st.session_state.authenticated = False
-    st.session_state.username = None
-    st.session_state.user_info = None
-    st.rerun()
+    """Realiza logout do usuário (limpa a sessão inteira, inclusive filtros).
+
+    Feito para ser o on_click do botão: o callback roda antes do rerun do clique,
+    então essa mesma execução já mostra o login, sem um st.rerun extra.
+    """
+    st.session_state.clear()
+    init_session_state()
+
+def _img_to_base64(path: str) -> str:
+    """Imagem codificada em base64, ou "" se não existir"""
+    try:
+        return base64.b64encode(Path(path).read_bytes()).decode("ascii")
+    except FileNotFoundError:
+        return ""
 
 def get_image_base64(image_path: Path) -> str:
     """Converte imagem para base64 para embedding no HTML"""
     try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
+        return _img_to_base64(str(image_path))
     except Exception:
         return ""
 
@@ -117,44 +205,30 @@ def login_form(
     auth_manager: AuthManager,
     logo_path: str = "logo.svg",
     css_path: str = "auth_style.css"
-):
-    """Renderiza formulário de login minimalista com suporte a logo SVG e CSS externo"""
-
-    # === Carrega CSS externo ===
-    try:
-        with open(css_path, "r", encoding="utf-8") as f:
-            css_content = f.read()
-        st.markdown(f"<style>{css_content}</style>", unsafe_allow_html=True)
-    except FileNotFoundError:
-        st.warning("⚠️ Arquivo CSS não encontrado. O layout pode ficar diferente do esperado.")
-
-    # --- Carrega logo ---
-    logo_html = ""
-    logo_file = Path(logo_path)
-
-    if logo_file.exists():
-        if logo_file.suffix.lower() == ".svg":
-            with open(logo_file, "r", encoding="utf-8") as f:
-                svg_content = f.read()
-                logo_html = f'<div class="logo-section">{svg_content}</div>'
+) -> bool:
+    """Renderiza formulário de login minimalista com suporte a logo SVG e CSS externo.
+
+    Retorna True quando o login é aceito: a tela de login é apagada e o app segue
+    na mesma execução, sem um st.rerun extra.
+    """
+    tela = st.empty()
+    logado = False
+
+    with tela.container():
+        # === Carrega CSS externo ===
+        css_html = _get_css(css_path)
+        if css_html is not None:
+            st.markdown(css_html, unsafe_allow_html=True)
         else:
-            logo_b64 = get_image_base64(logo_file)
-            logo_html = f"""
-            <div class="logo-section">
-                <img src="data:image/png;base64,{logo_b64}" alt="Logo" />
-            </div>
-            """
-    else:
-        logo_html = "<h2 style='text-align:center;'>Secretaria da Saúde - PE</h2>"
-
-    # Layout centralizado
-    col1, col2, col3 = st.columns([1, 3, 1])
+            st.warning("⚠️ Arquivo CSS não encontrado. O layout pode ficar diferente do esperado.")
 
-    with col2:
-        st.markdown('<div class="login-wrapper">', unsafe_allow_html=True)
+        # --- Carrega logo ---
+        logo_html = _build_logo_html(logo_path)
 
-        # Logo centralizada
-        st.markdown(logo_html, unsafe_allow_html=True)
+        # A centralização vem do CSS (.block-container estreito), sem st.columns.
+        # Logo centralizada; cada st.markdown fecha o próprio HTML, então wrapper e logo
+        # vão no mesmo elemento (um <div> aberto sozinho era fechado vazio)
+        st.markdown(f'<div class="login-wrapper">{logo_html}</div>', unsafe_allow_html=True)
 
         # Formulário de login
         with st.form("login_form"):
@@ -167,57 +241,54 @@ def login_form(
             submit = st.form_submit_button("Entrar", use_container_width=True)
 
             if submit:
+                # Checagem local antes do bcrypt: usuário só com espaços nem chega ao KDF
+                username = (username or "").strip()
+                password = password or ""
                 if not username or not password:
                     st.error("❌ Por favor, preencha todos os campos")
                     return False
 
-                if auth_manager.authenticate(username, password):
-                    st.session_state.authenticated = True
-                    st.session_state.username = username
-                    st.session_state.user_info = auth_manager.get_user_info(username)
-                    st.success("✅ Login realizado com sucesso!")
-                    st.balloons()
-                    st.rerun()
-                else:
+                if not auth_manager.authenticate(username, password):
                     st.error("❌ Usuário ou senha incorretos")
                     return False
 
-        # Expander de ajuda
-        with st.expander("Precisa de ajuda?"):
+                st.session_state.update(
+                    authenticated=True,
+                    username=username,
+                    user_info=auth_manager.get_user_info(username),
+                )
+                logado = True
+
+        if not logado:
+            # Expander de ajuda
+            with st.expander("Precisa de ajuda?"):
+                st.markdown(_HELP_MD)
+
+            # Rodapé
             st.markdown(
                 """
-                *Primeiro acesso:*  
-                Entre em contato com o administrador do sistema.
-                
-                *Esqueceu a senha:*  
-                Contate o suporte técnico da Secretaria.
-                
-                *Suporte:*  
-                📧 suporte@saude.pe.gov.br  
-                📞 (81) 3181-XXXX
-                """
+                <div class="login-footer">
+                    <p>🔒 Conexão segura • © 2025 Secretaria da Saúde - Governo de Pernambuco</p>
+                </div>
+                """,
+                unsafe_allow_html=True,
             )
 
-        # Rodapé
-        st.markdown(
-            """
-            <div class="login-footer">
-                <p>🔒 Conexão segura • © 2025 Secretaria da Saúde - Governo de Pernambuco</p>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
-
-        st.markdown("</div>", unsafe_allow_html=True)
+            return False
 
-    return False
+    # Apaga a tela de login (inclusive o CSS dela) antes de o app desenhar a página
+    tela.empty()
+    st.toast("✅ Login realizado com sucesso!")
+    st.balloons()
+    return True
 
 def require_authentication(auth_manager: AuthManager, logo_path: str = "logo.svg"):
     """Decorator/wrapper para proteger páginas"""
-    init_session_state()
-
-    if not st.session_state.authenticated:
-        login_form(auth_manager, logo_path)
-        st.stop()
+    # Caminho comum (já logado): uma única consulta ao session_state
+    if st.session_state.get("authenticated"):
+        return True
 
-    return True
\ No newline at end of file
+    init_session_state()
+    if login_form(auth_manager, logo_path):
+        return True
+    st.stop()
\ No newline at end of file
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+# Versão do formato das abas salvas em Parquet. Suba sempre que limpar_aba (ou o que
+# muda o conteúdo salvo) for alterado: pastas de versões anteriores deixam de ser lidas.
+FORMATO_PARQUET = 1
+
+
+def ler_abas_xlsx(caminho: Path, header_row_index: int) -> dict:
+    """Lê todas as abas com o engine calamine (Rust), bem mais rápido que o openpyxl."""
+    return pd.read_excel(
+        caminho,
+        sheet_name=None,
+        dtype=str,
+        header=header_row_index,
+        engine="calamine"
+    )
+
+
+def limpar_aba(item: tuple) -> tuple:
+    aba, df = item
+    if df is None or df.empty:
+        return aba, None
+
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.dropna(how="all").dropna(axis=1, how="all")
+    if df.empty:
+        return aba, None
+    # Strings no Arrow: menos memória e concat/isin/.str rodando em C++
+    return aba, df.reset_index(drop=True).astype("string[pyarrow]")
+
+
+def limpar_abas(sheets: dict) -> dict:
+    """Aplica limpar_aba em todas as abas, descartando as vazias."""
+    if not sheets:
+        return {}
+    # As abas são independentes e o trabalho pesado (dropna/astype) roda em C, fora do GIL
+    with ThreadPoolExecutor(max_workers=min(8, len(sheets))) as ex:
+        return {aba: df for aba, df in ex.map(limpar_aba, sheets.items()) if df is not None}
+
+
+def _sha256_arquivo(caminho: Path) -> str:
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def baixar_xlsx(sessao: requests.Session, url: str, cache_dir: Path, nome: str) -> tuple:
+    """Baixa o XLSX para cache_dir, revalidando com ETag/Last-Modified (HTTP 304 reaproveita o arquivo).
+
+    Retorna (caminho, sha256 do conteúdo); o hash identifica a versão da planilha
+    mesmo quando o servidor não manda validadores e o download se repete.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    arq_xlsx = cache_dir / f"{nome}.xlsx"
+    arq_etag = cache_dir / f"{nome}.etag"
+
+    headers = {}
+    validadores = {}
+    if arq_xlsx.exists() and arq_etag.exists():
+        try:
+            validadores = json.loads(arq_etag.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            validadores = {}
+        if validadores.get("etag"):
+            headers["If-None-Match"] = validadores["etag"]
+        if validadores.get("last_modified"):
+            headers["If-Modified-Since"] = validadores["last_modified"]
+
+    with sessao.get(url, headers=headers, stream=True, timeout=30) as resp:
+        if resp.status_code == 304:
+            return arq_xlsx, validadores.get("sha256") or _sha256_arquivo(arq_xlsx)
+        resp.raise_for_status()
+
+        # Copia em blocos de 1 MiB calculando o hash do conteúdo no caminho
+        resp.raw.decode_content = True
+        parcial = arq_xlsx.with_name(arq_xlsx.name + ".part")
+        h = hashlib.sha256()
+        with open(parcial, "wb") as f:
+            for bloco in iter(lambda: resp.raw.read(1 << 20), b""):
+                h.update(bloco)
+                f.write(bloco)
+        os.replace(parcial, arq_xlsx)
+
+        arq_etag.write_text(
+            json.dumps({
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "sha256": h.hexdigest(),
+            }),
+            encoding="utf-8"
+        )
+
+    return arq_xlsx, h.hexdigest()
+
+
+def pasta_parquet(raiz: Path, sha256: str, header_row_index: int) -> Path:
+    # Chave pelo conteúdo: um download repetido da mesma planilha reaproveita o Parquet;
+    # FORMATO_PARQUET no nome invalida o que foi salvo por uma versão anterior do código
+    return raiz / f"v{FORMATO_PARQUET}-{sha256[:32]}-h{header_row_index}"
+
+
+def ler_parquet(pasta: Path):
+    """Abas já limpas salvas em Parquet para esta versão do XLSX, ou None se não houver."""
+    try:
+        nomes = json.loads((pasta / "abas.json").read_text(encoding="utf-8"))
+        return {aba: pd.read_parquet(pasta / f"{i:03d}.parquet") for i, aba in enumerate(nomes)}
+    except (OSError, ValueError):
+        return None
+
+
+def gravar_parquet(pasta: Path, limpos: dict):
+    """Salva as abas limpas em Parquet (zstd) e apaga as versões antigas; falhas só desativam o cache."""
+    try:
+        pasta.parent.mkdir(parents=True, exist_ok=True)
+        # Nome temporário único: outro processo gravando a mesma versão não colide com este
+        parcial = Path(tempfile.mkdtemp(dir=pasta.parent, prefix=pasta.name + ".", suffix=".part"))
+    except OSError:
+        return
+
+    try:
+        for i, df in enumerate(limpos.values()):
+            df.to_parquet(parcial / f"{i:03d}.parquet", compression="zstd", index=False)
+        (parcial / "abas.json").write_text(json.dumps(list(limpos.keys())), encoding="utf-8")
+        # Se outro processo já publicou esta versão, o replace falha e fica a dele
+        os.replace(parcial, pasta)
+    except (OSError, ValueError):
+        shutil.rmtree(parcial, ignore_errors=True)
+        return
+
+    # Só depois de publicar: apaga versões antigas já concluídas, nunca um .part em gravação
+    for antiga in pasta.parent.iterdir():
+        if antiga != pasta and antiga.is_dir() and not antiga.name.endswith(".part"):
+            shutil.rmtree(antiga, ignore_errors=True)
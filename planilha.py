@@ -0,0 +1,88 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+import pandas as pd
+
+# Nome padronizado -> variações usadas nas abas. Cada aba é renomeada antes do concat,
+# assim a mesma informação cai numa única coluna em df_full.
+ALVO_NOMES = {
+    "UNIDADES DE DESTINO": ["UNIDADES DE DESTINO", "UNIDADE DE DESTINO", "UNIDADE(S) DE DESTINO"],
+    "VALOR TOTAL": ["VALOR TOTAL", "VALOR TOTAL (R$)", "TOTAL (R$)"],
+    "QUANTIDADE ENTREGUE NA UNIDADE": [
+        "QUANTIDADE ENTREGUE NA UNIDADE", "QTD ENTREGUE NA UNIDADE",
+        "QUANT. ENTREGUE NA UNIDADE", "QUANT ENTREGUE NA UNIDADE"
+    ],
+}
+
+_ACCENT_TBL = str.maketrans("áâãàéêíóôõúüçÁÂÃÀÉÊÍÓÔÕÚÜÇ", "aaaaeeiooouucAAAAEEIOOOUUC")
+
+@lru_cache(maxsize=4096)
+def norm(s: str) -> str:
+    s = str(s or "").strip().lower().translate(_ACCENT_TBL)
+    if s.isascii():
+        return s
+    # Sobrou algo fora da tabela (ex.: "°"): segue pelo caminho completo do unicodedata
+    return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("utf-8")
+
+
+ALIAS_NORM = {alvo: [norm(a) for a in aliases] for alvo, aliases in ALVO_NOMES.items()}
+
+# Todos os caracteres que str.isspace() reconhece, em classe literal: o \s do RE2 (strings
+# em Arrow) só cobre espaços ASCII e deixaria passar o NBSP
+_RE_ESPACOS = "[" + "".join(re.escape(chr(i)) for i in range(0x3001) if chr(i).isspace()) + "]+"
+
+
+def to_number_series(s: pd.Series) -> pd.Series:
+    """Converte valores no formato brasileiro ("R$ 1.234,56") para float, vazios/inválidos viram 0."""
+    texto = (
+        s.astype("string")
+        .str.replace("R$", "", regex=False)
+        # Qualquer espaço Unicode (NBSP depois de "R$", tab), como o float() aceitava
+        .str.replace(_RE_ESPACOS, "", regex=True)
+        .str.replace(".", "", regex=False)
+        .str.replace(",", ".", regex=False)
+        # float() aceita "_" entre dígitos (PEP 515); o to_numeric não
+        .str.replace(r"(?<=\d)_(?=\d)", "", regex=True)
+    )
+    return pd.to_numeric(texto, errors="coerce").fillna(0.0).astype(float)
+
+
+def mapear_colunas(df: pd.DataFrame) -> dict:
+    """Retorna {nome padronizado: coluna real} para os alvos de ALVO_NOMES presentes na aba.
+
+    Só renomeia quando o nome normalizado da coluna é exatamente um dos aliases: nomes que
+    apenas contêm um alias ("SUBTOTAL (R$)", "VALOR TOTAL EMPENHADO") são outras medidas e
+    ficam como estão. A busca aproximada fica só no find_col do gráfico.
+    """
+    # Colunas que já têm um nome padronizado nunca são renomeadas para outro alvo
+    usadas = set(ALVO_NOMES) & set(df.columns)
+    mapa = {alvo: alvo for alvo in usadas}
+
+    cols_norm = {c: norm(c) for c in df.columns}
+    for alvo, aliases_norm in ALIAS_NORM.items():
+        if alvo in mapa:
+            continue
+        for an in aliases_norm:
+            achada = next((c for c in df.columns if c not in usadas and cols_norm[c] == an), None)
+            if achada is not None:
+                mapa[alvo] = achada
+                usadas.add(achada)
+                break
+    return mapa
+
+
+@lru_cache(maxsize=256)
+def _find_col(colunas: tuple, targets: tuple):
+    cols_norm = {c: norm(c) for c in colunas}
+    for t in targets:
+        tnorm = norm(t)
+        for c, cn in cols_norm.items():
+            if cn == tnorm or tnorm in cn:
+                return c
+    return None
+
+
+def find_col(df, targets):
+    # Os nomes de coluna não mudam entre reruns: a busca fica memorizada por (colunas, alvos)
+    return _find_col(tuple(df.columns), tuple(targets))
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pandas as pd
+import pytest
+import requests
+
+from carga import FORMATO_PARQUET, baixar_xlsx, gravar_parquet, ler_parquet, pasta_parquet
+
+CONTEUDO = b"PK\x03\x04 planilha de teste" * 1000
+ETAG = '"v1"'
+
+
+def abas_exemplo():
+    return {
+        "2024": pd.DataFrame({"N° OF": ["1", None], "VALOR TOTAL": ["R$ 10,00", "5"]}, dtype="string[pyarrow]"),
+        "2023": pd.DataFrame({"UNIDADES DE DESTINO": ["HOSPITAL A"]}, dtype="string[pyarrow]"),
+    }
+
+
+def test_parquet_ida_e_volta(tmp_path):
+    pasta = pasta_parquet(tmp_path, "ab" * 32, 2)
+    abas = abas_exemplo()
+    gravar_parquet(pasta, abas)
+
+    lidas = ler_parquet(pasta)
+    assert list(lidas) == list(abas)
+    for aba, df in abas.items():
+        pd.testing.assert_frame_equal(lidas[aba], df)
+
+
+def test_parquet_inexistente_devolve_none(tmp_path):
+    assert ler_parquet(pasta_parquet(tmp_path, "cd" * 32, 2)) is None
+
+
+def test_pasta_parquet_inclui_formato(tmp_path):
+    assert pasta_parquet(tmp_path, "ab" * 32, 2).name.startswith(f"v{FORMATO_PARQUET}-")
+
+
+def test_gravar_parquet_apaga_so_versoes_concluidas(tmp_path):
+    antiga = tmp_path / "v0-antiga-h2"
+    antiga.mkdir()
+    em_gravacao = tmp_path / "v1-outra-h2.x.part"
+    em_gravacao.mkdir()
+
+    pasta = pasta_parquet(tmp_path, "ab" * 32, 2)
+    gravar_parquet(pasta, abas_exemplo())
+
+    assert not antiga.exists()
+    assert em_gravacao.exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([pasta.name, em_gravacao.name])
+
+
+def _servidor(com_validadores):
+    pedidos = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            pedidos.append(dict(self.headers))
+            if com_validadores and self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            if com_validadores:
+                self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", str(len(CONTEUDO)))
+            self.end_headers()
+            self.wfile.write(CONTEUDO)
+
+        def log_message(self, *args):
+            pass
+
+    srv = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_port}/planilha.xlsx", pedidos
+
+
+@pytest.fixture
+def servidor_etag():
+    srv, url, pedidos = _servidor(com_validadores=True)
+    yield url, pedidos
+    srv.shutdown()
+
+
+@pytest.fixture
+def servidor_sem_etag():
+    srv, url, pedidos = _servidor(com_validadores=False)
+    yield url, pedidos
+    srv.shutdown()
+
+
+def test_baixar_xlsx_revalida_com_etag(tmp_path, servidor_etag):
+    url, pedidos = servidor_etag
+    sha = hashlib.sha256(CONTEUDO).hexdigest()
+
+    with requests.Session() as sessao:
+        arq, sha1 = baixar_xlsx(sessao, url, tmp_path, "planilha")
+        assert arq.read_bytes() == CONTEUDO
+        assert sha1 == sha
+        assert json.loads((tmp_path / "planilha.etag").read_text(encoding="utf-8"))["sha256"] == sha
+
+        # Segunda chamada manda o ETag salvo; o 304 reaproveita o arquivo e o hash
+        arq2, sha2 = baixar_xlsx(sessao, url, tmp_path, "planilha")
+
+    assert pedidos[0].get("If-None-Match") is None
+    assert pedidos[1].get("If-None-Match") == ETAG
+    assert (arq2, sha2) == (arq, sha)
+    assert arq2.read_bytes() == CONTEUDO
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_baixar_xlsx_sem_validadores_mantem_hash(tmp_path, servidor_sem_etag):
+    url, pedidos = servidor_sem_etag
+
+    with requests.Session() as sessao:
+        _, sha1 = baixar_xlsx(sessao, url, tmp_path, "planilha")
+        _, sha2 = baixar_xlsx(sessao, url, tmp_path, "planilha")
+
+    assert "If-None-Match" not in pedidos[1]
+    assert sha1 == sha2 == hashlib.sha256(CONTEUDO).hexdigest()
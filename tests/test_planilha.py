@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from planilha import find_col, mapear_colunas, to_number_series
+
+
+def to_number_antigo(v):
+    """Conversão escalar original do gráfico, usada como referência."""
+    if pd.isna(v):
+        return 0.0
+    x = str(v).strip().replace("R$", "").replace(" ", "").replace(".", "").replace(",", ".")
+    try:
+        return float(x)
+    except Exception:
+        return 0.0
+
+
+@pytest.mark.parametrize("valor", [
+    "R$ 1.234,56",
+    "R$\xa01.234,56",
+    "R$\t1.234,56",
+    " 12,5\t",
+    "\xa0\xa0987\xa0",
+    "1_000",
+    "1__000",
+    "10",
+    "abc",
+    "",
+    None,
+])
+def test_to_number_series_igual_ao_escalar(valor):
+    resultado = to_number_series(pd.Series([valor], dtype="object")).iloc[0]
+    assert resultado == to_number_antigo(valor)
+
+
+def test_mapear_colunas_renomeia_so_alias_exato():
+    df = pd.DataFrame(columns=["Valor Total (R$)", "Unidade de Destino", "Qtd entregue na unidade"])
+    assert mapear_colunas(df) == {
+        "VALOR TOTAL": "Valor Total (R$)",
+        "UNIDADES DE DESTINO": "Unidade de Destino",
+        "QUANTIDADE ENTREGUE NA UNIDADE": "Qtd entregue na unidade",
+    }
+
+
+@pytest.mark.parametrize("coluna", ["SUBTOTAL (R$)", "VALOR TOTAL EMPENHADO"])
+def test_mapear_colunas_nao_renomeia_outra_medida(coluna):
+    df = pd.DataFrame(columns=[coluna, "UNIDADES DE DESTINO"])
+    assert "VALOR TOTAL" not in mapear_colunas(df)
+    # O gráfico continua achando a coluna pela busca aproximada
+    assert find_col(df, ["VALOR TOTAL", "TOTAL (R$)"]) == coluna